@@ -1,7 +1,8 @@
 import numpy as np
 import warnings
-import math
 
+from functools import lru_cache
+from qiskit.circuit import Gate
 from qiskit.circuit.library import IGate
 from Src.Functions import Func_run_protocol as Run_protocol
 from qiskit import QuantumCircuit, QuantumRegister, ClassicalRegister
@@ -48,14 +49,18 @@ class AND_protocol_1(Run_protocol):
 
         # parameters
         self.type_communication = type_communication
-        self.num_qubits = (self.qubit_Bob - self.qubit_Alice) + 1
         self.r = r
         self.theta = np.pi/(4 * (self.r + 1))
 
 
-    def reflection(self):
+    @staticmethod
+    @lru_cache(maxsize=None)
+    def _build_reflection(theta: float) -> Gate:
         """
-        This method implements the reflection operator and create the gate for it.
+        This method creates the gate for the reflection operator. It is cached since the gate only depends on theta.
+
+        Args:
+            theta (float): The angle of the reflection.
 
         Returns:
             Gate: The quantum gate for the reflection operator
@@ -64,22 +69,93 @@ class AND_protocol_1(Run_protocol):
         qreg = QuantumRegister(1)
         reflection_gate = QuantumCircuit(qreg)
 
-        reflection_gate.ry(-2 * self.theta, qreg)
+        reflection_gate.ry(-2 * theta, qreg)
         reflection_gate.z(qreg)
-        reflection_gate.ry(2 * self.theta, qreg)
+        reflection_gate.ry(2 * theta, qreg)
 
         reflection_gate = reflection_gate.to_gate(label = "Reflection")
 
         return reflection_gate
+
+    def reflection(self) -> Gate:
+        """
+        This method returns the gate of the reflection operator. The gate is built once for each value of theta.
+
+        Returns:
+            Gate: The quantum gate for the reflection operator
+        """
+
+        return self._build_reflection(self.theta)
+
+    def alice_operation(self, qcircuit: QuantumCircuit, qubit) -> None:
+        """
+        This method appends Alice's operation to the circuit. On the simulator without noise, the reflection operator is
+        written with its basic gates and the Z gate in its middle is replaced by a rotation with the parameter of Alice. The
+        rotation is bound to pi when her input is 1, which gives the reflection, and to 0 otherwise, which gives the identity.
+        This way the circuit is the same for all the inputs and it is only transpiled once. On Fake Fez and on the backend,
+        the reflection or the identity gate is appended depending on her input, so the executed gates, and their noise, are
+        the same as in the results taken before.
+
+        Args:
+            qcircuit (QuantumCircuit): The circuit of the protocol.
+            qubit (Qubit): The qubit on which to apply the operation.
+        """
+
+        if self.simulator and not self.noise:
+            qcircuit.ry(-2 * self.theta, qubit)
+            qcircuit.rz(self.alice_param, qubit)
+            qcircuit.ry(2 * self.theta, qubit)
+
+        elif self.Alice_input == 1:
+            qcircuit.append(self.reflection(), [qubit])
+
+        else:
+            qcircuit.append(IGate(), [qubit])
+
+    def bob_operation(self, qcircuit: QuantumCircuit, qubit) -> None:
+        """
+        This method appends Bob's operation to the circuit. On the simulator without noise, it is a rotation around Z with
+        the parameter of Bob which is bound to pi when his input is 1, which gives the Z gate, and to 0 otherwise. On Fake
+        Fez and on the backend, the Z gate or the identity gate is appended depending on his input.
+
+        Args:
+            qcircuit (QuantumCircuit): The circuit of the protocol.
+            qubit (Qubit): The qubit on which to apply the operation.
+        """
+
+        if self.simulator and not self.noise:
+            qcircuit.rz(self.bob_param, qubit)
+
+        elif self.Bob_input == 1:
+            qcircuit.z(qubit)
+
+        else:
+            qcircuit.append(IGate(), [qubit])
+
+    def parameter_values(self) -> dict:
+        """
+        This method returns the values of the parameters of Alice and Bob depending on their inputs. The circuits of Fake
+        Fez and of the backend have no parameters.
+
+        Returns:
+            dict: The value of each parameter of the circuit.
+        """
+
+        if not (self.simulator and not self.noise):
+            return {}
+
+        return {
+            self.alice_param: np.pi if self.Alice_input == 1 else 0.0,
+            self.bob_param: np.pi if self.Bob_input == 1 else 0.0
+        }
     
-    def protocol1_cnot(self) -> tuple[dict, int]:
+    def circuit_protocol1_cnot(self) -> QuantumCircuit:
         """
-        Method for the execution of the first protocol for computing the logical operation AND. The communication between Alice and
-        Bob is done using CNOT gates.
+        Method for the construction of the circuit of the first protocol for computing the logical operation AND. The communication
+        between Alice and Bob is done using CNOT gates.
 
         Returns:
-            tuple[dict, int]: The counts and the output of the most frequent result. It is 1 if Bob and Alice's inputs 
-            are 1 and 0 otherwise.
+            QuantumCircuit: The circuit of the protocol.
         """
 
         # Warning for the input "r"
@@ -90,60 +166,58 @@ class AND_protocol_1(Run_protocol):
         creg = ClassicalRegister(1)
         qcircuit = QuantumCircuit(qreg, creg)
 
-        reflection_operator = self.reflection()
-
         for _ in range(self.r):
 
             # Alice's operation depending on her input
-            if self.Alice_input == 1:
-                qcircuit.append(reflection_operator, [0])
-                
-            else:
-                qcircuit.append(IGate(), [0])
+            self.alice_operation(qcircuit, qreg[0])
 
-            qcircuit.barrier()
+            self.apply_barrier(qcircuit)
 
             # Alice sends to Bob
-            comm_qc = self.communication_CNOT()
-            qcircuit.compose(comm_qc, qreg, inplace=True)
+            self.apply_communication_CNOT(qcircuit, qreg)
 
-            qcircuit.barrier()
+            self.apply_barrier(qcircuit)
 
             # Bob's operation depending on his input
-            if self.Bob_input == 1:
-                qcircuit.z([self.num_qubits - 1])
-            else:
-                qcircuit.append(IGate(), [self.num_qubits - 1])
+            self.bob_operation(qcircuit, qreg[self.num_qubits - 1])
 
-            qcircuit.barrier()
+            self.apply_barrier(qcircuit)
 
             # Bob sends back to Alice
-            qcircuit.compose(comm_qc.inverse(), qreg, inplace=True)
+            self.apply_communication_CNOT(qcircuit, qreg, inverse=True)
 
-            qcircuit.barrier()
+            self.apply_barrier(qcircuit)
 
         # Alice's operation depending on her input
-        if self.Alice_input == 1:
-            qcircuit.append(reflection_operator, [0])
-        else:
-            qcircuit.append(IGate(), [0])
+        self.alice_operation(qcircuit, qreg[0])
 
         qcircuit.measure(qreg[0], creg)
 
-        counts, output = self.execute_protocol(qcircuit)
-        
-        return counts, output
-    
-    def protocol_one_qubit(self) -> tuple[dict, int]:
+        return qcircuit
+
+    def protocol1_cnot(self) -> tuple[dict, int]:
         """
-        This method implements the protocol on a single qubit. This means that there is no communication between Alice and Bob,
-        they use the same qubit.
+        Method for the execution of the first protocol for computing the logical operation AND. The communication between Alice and
+        Bob is done using CNOT gates.
 
         Returns:
             tuple[dict, int]: The counts and the output of the most frequent result. It is 1 if Bob and Alice's inputs 
             are 1 and 0 otherwise.
         """
 
+        counts, output = self.execute_protocol(self.build_protocol("cnot"), self.parameter_values())
+
+        return counts, output
+    
+    def circuit_protocol_one_qubit(self) -> QuantumCircuit:
+        """
+        This method builds the circuit of the protocol on a single qubit. This means that there is no communication between
+        Alice and Bob, they use the same qubit.
+
+        Returns:
+            QuantumCircuit: The circuit of the protocol.
+        """
+
         # Warning for the input "r"
         if (self.r % 2) == 0:
             warnings.warn("The value r needs to be an odd number for this protocol.")
@@ -152,161 +226,137 @@ class AND_protocol_1(Run_protocol):
         creg = ClassicalRegister(1)
         qcircuit = QuantumCircuit(qreg, creg)
 
-        reflection_operator = self.reflection()
-
         for _ in range(self.r):
 
             # Alice's operation depending on her input
-            if self.Alice_input == 1:
-                qcircuit.append(reflection_operator, qreg)
-                
-            else:
-                qcircuit.append(IGate(), qreg)
+            self.alice_operation(qcircuit, qreg[0])
 
-            qcircuit.barrier()
+            self.apply_barrier(qcircuit)
 
             # Bob's operation depending on his input
-            if self.Bob_input == 1:
-                qcircuit.z(qreg)
-            else:
-                qcircuit.append(IGate(), qreg)
+            self.bob_operation(qcircuit, qreg[0])
 
-            qcircuit.barrier()
+            self.apply_barrier(qcircuit)
 
         # Alice's operation depending on her input
-        if self.Alice_input == 1:
-            qcircuit.append(reflection_operator, qreg)
-        else:
-            qcircuit.append(IGate(), qreg)
+        self.alice_operation(qcircuit, qreg[0])
 
         qcircuit.measure(qreg, creg)
 
-        self.counts, self.output = self.execute_protocol(qcircuit)
+        return qcircuit
 
-        return self.counts, self.output
-    
-    def protocol1_entanglement(self) -> tuple[dict, int]:
+    def protocol_one_qubit(self) -> tuple[dict, int]:
         """
-        Method for the execution of the first protocol for computing the logical operation AND. The communication between Alice and
-        Bob is done using entanglement swapping.
+        This method implements the protocol on a single qubit. This means that there is no communication between Alice and Bob,
+        they use the same qubit.
 
         Returns:
             tuple[dict, int]: The counts and the output of the most frequent result. It is 1 if Bob and Alice's inputs 
             are 1 and 0 otherwise.
         """
 
+        circuit = self.cached_circuit(self.circuit_key("one_qubit"), self.circuit_protocol_one_qubit)
+        self.counts, self.output = self.execute_protocol(circuit, self.parameter_values())
+
+        return self.counts, self.output
+    
+    def circuit_protocol1_entanglement(self) -> QuantumCircuit:
+        """
+        Method for the construction of the circuit of the first protocol for computing the logical operation AND. The communication
+        between Alice and Bob is done using entanglement swapping.
+
+        Returns:
+            QuantumCircuit: The circuit of the protocol.
+        """
+
         qreg = QuantumRegister(self.num_qubits)
         creg = ClassicalRegister(self.num_qubits - 2)
         final_meas_creg = ClassicalRegister(1)
         qcircuit = QuantumCircuit(qreg, creg, final_meas_creg)
 
-        reflection_operator = self.reflection()
-
         for _ in range(self.r):
 
             # Alice's operation depending on her input
-            if self.Alice_input == 1:
-                qcircuit.append(reflection_operator, [0])
-                
-            else:
-                qcircuit.append(IGate(), [0])
+            self.alice_operation(qcircuit, qreg[0])
 
-            qcircuit.barrier()
+            self.apply_barrier(qcircuit)
 
             # Alice sends to Bob
-            num_EPR_pairs = int((self.num_qubits/2) - 2)
-
-            # Create the EPR pairs on the qubits between Alice and Bob
-            index_EPR = 1
-            for _ in range(num_EPR_pairs + 1):
-                qcircuit.h(qreg[index_EPR])
-                qcircuit.cx(qreg[index_EPR], qreg[index_EPR + 1])
-                index_EPR += 2
-
-            # Change the basis for the Bell measure
-            index_base = 0
-            for _ in range(num_EPR_pairs + 1):
-                qcircuit.cx(qreg[index_base], qreg[index_base + 1])
-                qcircuit.h(qreg[index_base])
-                index_base += 2
+            qcircuit.compose(self.alice_to_bob_swap_block(), qubits = qreg, clbits = creg, inplace = True)
 
-            # Measure et reset the qubits
-            for i in range(self.num_qubits - 2):
-                qcircuit.measure(qreg[i], creg[i])
-                qcircuit.reset(qreg[i])
+            self.apply_barrier(qcircuit)
 
-            # Apply the X and Z corrections
-            index = 0
-            while index < (self.num_qubits - 2):
-                with qcircuit.if_test((creg[index + 1], 1)):
-                    qcircuit.x(qreg[self.num_qubits - 2])
+            # Bob's operation depending on his input
+            self.bob_operation(qcircuit, qreg[self.num_qubits - 1])
 
-                with qcircuit.if_test((creg[index], 1)):
-                    qcircuit.z(qreg[self.num_qubits - 2])
+            self.apply_barrier(qcircuit)
 
-                index += 2
+            # Bob sends back to Alice
+            qcircuit.compose(self.bob_to_alice_swap_block(), qubits = qreg, clbits = creg, inplace = True)
 
-            qcircuit.swap(qreg[self.num_qubits - 2], qreg[self.num_qubits - 1])
+            self.apply_barrier(qcircuit)
 
-            qcircuit.barrier()
+        # Alice's operation depending on her input
+        self.alice_operation(qcircuit, qreg[0])
 
-            # Bob's operation depending on his input
-            if self.Bob_input == 1:
-                qcircuit.z([self.num_qubits - 1])
-            else:
-                qcircuit.append(IGate(), [self.num_qubits - 1])
+        qcircuit.measure(qreg[0], final_meas_creg)
 
-            qcircuit.barrier()
+        return qcircuit
 
-            # Bob sends back to Alice
-            # Create the EPR pairs on the qubits between Alice and Bob
-            index_EPR = self.num_qubits - 2
-            for _ in range(num_EPR_pairs + 1):
-                qcircuit.h(qreg[index_EPR])
-                qcircuit.cx(qreg[index_EPR], qreg[index_EPR - 1])
-                index_EPR -= 2
-
-            # Change the basis for the Bell measure
-            index_base = self.num_qubits - 1
-            for _ in range(num_EPR_pairs + 1):
-                qcircuit.cx(qreg[index_base], qreg[index_base - 1])
-                qcircuit.h(qreg[index_base])
-                index_base -= 2
-
-            # Measure et reset the qubits
-            index_meas = self.num_qubits - 1
-            while index_meas >= 2:
-                qcircuit.measure(qreg[index_meas], creg[index_meas - 2])
-                qcircuit.reset(qreg[index_meas])
-                index_meas -= 1
-
-            # Apply the X and Z corrections
-            index = self.num_qubits - 1
-            while index > 2:
-                with qcircuit.if_test((creg[index - 3], 1)):
-                    qcircuit.x(qreg[1])
-
-                with qcircuit.if_test((creg[index - 2], 1)):
-                    qcircuit.z(qreg[1])
-
-                index -= 2
-
-            qcircuit.swap(qreg[1], qreg[0])
-
-            qcircuit.barrier()
+    def protocol1_entanglement(self) -> tuple[dict, int]:
+        """
+        Method for the execution of the first protocol for computing the logical operation AND. The communication between Alice and
+        Bob is done using entanglement swapping.
 
-        # Alice's operation depending on her input
-        if self.Alice_input == 1:
-            qcircuit.append(reflection_operator, [0])
-        else:
-            qcircuit.append(IGate(), [0])
+        Returns:
+            tuple[dict, int]: The counts and the output of the most frequent result. It is 1 if Bob and Alice's inputs 
+            are 1 and 0 otherwise.
+        """
 
-        qcircuit.measure(qreg[0], final_meas_creg)
+        counts, output = self.execute_protocol(self.build_protocol("entanglement"), self.parameter_values())
 
-        counts, output = self.execute_protocol(qcircuit)
-        
         return counts, output
     
+    def circuit_key(self, name: str) -> tuple:
+        """
+        This method returns the key of the circuit of the protocol for cached_circuit. It holds the options that define
+        the structure of the circuit.
+
+        Args:
+            name (str): The name of the circuit of the protocol, it is either "cnot", "entanglement" or "one_qubit".
+
+        Returns:
+            tuple: The key of the circuit.
+        """
+
+        key = (name, self.num_qubits, self.r)
+
+        # The circuits of Fake Fez and of the backend depend on the inputs, see alice_operation
+        if not (self.simulator and not self.noise):
+            key += (self.Alice_input == 1, self.Bob_input == 1)
+
+        return key
+
+    def build_protocol(self, type_communication: str | None = None) -> QuantumCircuit:
+        """
+        This method builds the circuit of the protocol depending on the type of communication. The circuit is only
+        built once and then reused for the following executions and, on the simulator without noise, for all the inputs of Alice and Bob.
+
+        Args:
+            type_communication (str, optional): The communication between Alice and Bob, it is either "cnot" or
+            "entanglement". Defaults to the chosen type of communication.
+
+        Returns:
+            QuantumCircuit: The circuit of the protocol.
+        """
+
+        type_communication = type_communication or self.type_communication
+
+        if type_communication == "cnot":
+            return self.cached_circuit(self.circuit_key("cnot"), self.circuit_protocol1_cnot)
+
+        return self.cached_circuit(self.circuit_key("entanglement"), self.circuit_protocol1_entanglement)
+
     def execute_first_protocol(self) -> int:
         """
         This method execute the protocol depending on the chosen type of communication and returns the output.
@@ -315,11 +365,7 @@ class AND_protocol_1(Run_protocol):
             int: The output of the AND is 0 or 1.
         """
 
-        if self.type_communication == "cnot":
-            self.counts, self.output = self.protocol1_cnot()
-        
-        else:
-            self.counts, self.output = self.protocol1_entanglement()
+        self.counts, self.output = self.execute_protocol(self.build_protocol(), self.parameter_values())
 
         print(f"The output for AND({self.Alice_input}, {self.Bob_input}) : {self.output}")
 
@@ -328,20 +374,47 @@ class AND_protocol_1(Run_protocol):
     def majority_vote(self) -> None:
         """
         This method displays the output of the logical AND according to a majority vote. The protocol is repeated 3 times and
-        the most frequent output is chosen.
+        the most frequent output is chosen. The 3 repetitions are executed in a single job.
         """
 
+        results = self.execute_protocol_repeated(self.build_protocol(), self.parameter_values(), repetitions = 3)
+
         outputs = []
-        for _ in range(3):
-            output = self.execute_first_protocol()
+        for _, output in results:
+            print(f"The output for AND({self.Alice_input}, {self.Bob_input}) : {output}")
             outputs.append(output)
 
-        final_output = max(set(outputs), key=outputs.count)
+        self.counts, self.output = results[-1]
+
+        # The outputs are bits, so the majority is 1 when more than half of them are 1
+        final_output = "1" if 2 * sum(int(output) for output in outputs) > len(outputs) else "0"
 
         print(f"The most frequent output for AND({self.Alice_input}, {self.Bob_input}) : {final_output}")
         
         return None
     
+    @staticmethod
+    def cost_protocol1_vec(r: np.ndarray) -> np.ndarray:
+        """
+        This method returns the communication cost of this protocol for each number of iterations r, as described in the
+        following paper https://arxiv.org/pdf/1505.03110
+
+        Args:
+            r (np.ndarray): The numbers of iterations r.
+
+        Returns:
+            np.ndarray: The communication cost for each r.
+        """
+
+        r = np.asarray(r, dtype = np.float64)
+        theta = np.pi/(4 * (r + 1))
+
+        p = np.sin(theta) ** 2
+        term1 = -p * np.log2(p)
+        term2 = (1 - p) * np.log2(1 - p)
+
+        return (r + 1) * (term1 - term2)
+
     def communication_cost_protocol1(self) -> float:
         """
         This method returns the communication cost of this protocol as described in the following paper
@@ -351,10 +424,4 @@ class AND_protocol_1(Run_protocol):
             float: The communication cost.
         """
 
-        p = (math.sin(self.theta)) ** 2
-        term1 = -p * math.log(p, 2)
-        term2 = (1 - p) * math.log(1 - p, 2)
-
-        cost = (self.r + 1) * (term1 - term2)
-
-        return cost
\ No newline at end of file
+        return float(self.cost_protocol1_vec(self.r))
\ No newline at end of file
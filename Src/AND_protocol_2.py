@@ -1,5 +1,4 @@
 import numpy as np
-import math
 
 from qiskit.circuit.library import IGate
 from Src.Functions import Func_run_protocol as Run_protocol
@@ -47,22 +46,56 @@ class AND_protocol_2(Run_protocol):
 
         # parameters
         self.type_communication = type_communication
-        self.num_qubits = (self.qubit_Bob - self.qubit_Alice) + 1
         self.r = r
         self.theta = np.pi/self.r
 
+    def alice_operation(self, qcircuit: QuantumCircuit, qubit) -> None:
+        """
+        This method appends Alice's operation to the circuit. On the simulator without noise, it is a rotation around X with
+        the parameter of Alice, so the circuit is the same for all her inputs and it is only transpiled once. On Fake Fez
+        and on the backend, the rotation by theta or the identity gate is appended depending on her input, so the executed
+        gates, and their noise, are the same as in the results taken before.
+
+        Args:
+            qcircuit (QuantumCircuit): The circuit of the protocol.
+            qubit (Qubit): The qubit on which to apply the operation.
+        """
 
-    def protocol2_cnot(self) -> tuple[dict, int]:
+        if self.simulator and not self.noise:
+            qcircuit.rx(self.alice_param, qubit)
+
+        elif self.Alice_input == 1:
+            qcircuit.rx(self.theta, qubit)
+
+        else:
+            qcircuit.append(IGate(), [qubit])
+
+    def parameter_values(self) -> dict:
         """
-        Method for the execution of the second protocol for computing the logical operation AND. The communication between Alice and
-        Bob is done using CNOT gates.
+        This method returns the value of the parameter of Alice depending on her input. The rotation of Alice is bound to
+        theta when her input is 1 and to 0 otherwise. The operation of Bob is a reset, so it can not be a parameter and
+        there is one circuit for each of his inputs. The circuits of Fake Fez and of the backend have no
+        parameters.
 
         Returns:
-            tuple[dict, int]: The counts and the output of the most frequent result. It is 1 if Bob and Alice's inputs 
-            are 1 and 0 otherwise.
+            dict: The value of each parameter of the circuit.
         """
 
-        num_qubits = (self.qubit_Bob - self.qubit_Alice) + 1
+        if not (self.simulator and not self.noise):
+            return {}
+
+        return {self.alice_param: self.theta if self.Alice_input == 1 else 0.0}
+
+    def circuit_protocol2_cnot(self) -> QuantumCircuit:
+        """
+        Method for the construction of the circuit of the second protocol for computing the logical operation AND. The communication
+        between Alice and Bob is done using CNOT gates.
+
+        Returns:
+            QuantumCircuit: The circuit of the protocol.
+        """
+
+        num_qubits = self.num_qubits
         qreg = QuantumRegister(num_qubits)
         creg = ClassicalRegister(1)
         qcircuit = QuantumCircuit(qreg, creg)
@@ -70,47 +103,56 @@ class AND_protocol_2(Run_protocol):
         for _ in range(self.r):
 
             # Alice's operation depending on her input
-            if self.Alice_input == 1:
-                qcircuit.rx(self.theta, qreg[0])
-            else:
-                qcircuit.append(IGate(), [0])
+            self.alice_operation(qcircuit, qreg[0])
 
-            qcircuit.barrier()
+            self.apply_barrier(qcircuit)
 
             # Alice sends to Bob
-            comm_qc = self.communication_CNOT()
-            qcircuit.compose(comm_qc, qreg, inplace=True)
+            self.apply_communication_CNOT(qcircuit, qreg)
 
-            qcircuit.barrier()
+            self.apply_barrier(qcircuit)
 
             # Bob's operation depending on his input
             if self.Bob_input == 0:
-                for _ in range(4):
+                # A reset is exact on the simulators, the repeated resets are only useful on the backend where a single
+                # reset does not always bring the qubit back to 0
+                for _ in range(1 if self.simulator else 4):
                     qcircuit.reset(qreg[1])
             else:
                 qcircuit.append(IGate(), [1])
 
-            qcircuit.barrier()
+            self.apply_barrier(qcircuit)
 
             # Bob sends back to Alice
-            qcircuit.compose(comm_qc.inverse(), qreg, inplace=True)
+            self.apply_communication_CNOT(qcircuit, qreg, inverse=True)
 
         qcircuit.measure(qreg[0], creg)
 
-        counts, output = self.execute_protocol(qcircuit)
+        return qcircuit
 
-        return counts, output
-    
-    def protocol2_entanglement(self) -> tuple[dict, int]:
+    def protocol2_cnot(self) -> tuple[dict, int]:
         """
         Method for the execution of the second protocol for computing the logical operation AND. The communication between Alice and
-        Bob is done using entanglement swapping.
+        Bob is done using CNOT gates.
 
         Returns:
             tuple[dict, int]: The counts and the output of the most frequent result. It is 1 if Bob and Alice's inputs 
             are 1 and 0 otherwise.
         """
 
+        counts, output = self.execute_protocol(self.build_protocol("cnot"), self.parameter_values())
+
+        return counts, output
+    
+    def circuit_protocol2_entanglement(self) -> QuantumCircuit:
+        """
+        Method for the construction of the circuit of the second protocol for computing the logical operation AND. The communication
+        between Alice and Bob is done using entanglement swapping.
+
+        Returns:
+            QuantumCircuit: The circuit of the protocol.
+        """
+
         qreg = QuantumRegister(self.num_qubits)
         creg = ClassicalRegister(self.num_qubits - 2)
         final_meas_creg = ClassicalRegister(1)
@@ -119,49 +161,14 @@ class AND_protocol_2(Run_protocol):
         for _ in range(self.r):
 
             # Alice's operation depending on her input
-            if self.Alice_input == 1:
-                qcircuit.rx(np.pi/self.r, qreg[0])
-            else:
-                qcircuit.append(IGate(), [0])
+            self.alice_operation(qcircuit, qreg[0])
 
-            qcircuit.barrier()
+            self.apply_barrier(qcircuit)
 
             # Alice sends to Bob
-            num_EPR_pairs = int((self.num_qubits/2) - 2)
-
-            # Create the EPR pairs on the qubits between Alice and Bob
-            index_EPR = 1
-            for _ in range(num_EPR_pairs + 1):
-                qcircuit.h(qreg[index_EPR])
-                qcircuit.cx(qreg[index_EPR], qreg[index_EPR + 1])
-                index_EPR += 2
-
-            # Change the basis for the Bell measure
-            index_base = 0
-            for _ in range(num_EPR_pairs + 1):
-                qcircuit.cx(qreg[index_base], qreg[index_base + 1])
-                qcircuit.h(qreg[index_base])
-                index_base += 2
-
-            # Measure et reset the qubits
-            for i in range(self.num_qubits - 2):
-                qcircuit.measure(qreg[i], creg[i])
-                qcircuit.reset(qreg[i])
-
-            # Apply the X and Z corrections
-            index = 0
-            while index < (self.num_qubits - 2):
-                with qcircuit.if_test((creg[index + 1], 1)):
-                    qcircuit.x(qreg[self.num_qubits - 2])
+            qcircuit.compose(self.alice_to_bob_swap_block(), qubits = qreg, clbits = creg, inplace = True)
 
-                with qcircuit.if_test((creg[index], 1)):
-                    qcircuit.z(qreg[self.num_qubits - 2])
-
-                index += 2
-
-            qcircuit.swap(qreg[self.num_qubits - 2], qreg[self.num_qubits - 1])
-
-            qcircuit.barrier()
+            self.apply_barrier(qcircuit)
 
             # Bob's operation depending on his input
             if self.Bob_input == 0:
@@ -169,49 +176,69 @@ class AND_protocol_2(Run_protocol):
             else:
                 qcircuit.append(IGate(), [1])
 
-            qcircuit.barrier()
+            self.apply_barrier(qcircuit)
 
             # Bob sends back to Alice
-            # Create the EPR pairs on the qubits between Alice and Bob
-            index_EPR = self.num_qubits - 2
-            for _ in range(num_EPR_pairs + 1):
-                qcircuit.h(qreg[index_EPR])
-                qcircuit.cx(qreg[index_EPR], qreg[index_EPR - 1])
-                index_EPR -= 2
-
-            # Change the basis for the Bell measure
-            index_base = self.num_qubits - 1
-            for _ in range(num_EPR_pairs + 1):
-                qcircuit.cx(qreg[index_base], qreg[index_base - 1])
-                qcircuit.h(qreg[index_base])
-                index_base -= 2
-
-            # Measure et reset the qubits
-            index_meas = self.num_qubits - 1
-            while index_meas >= 2:
-                qcircuit.measure(qreg[index_meas], creg[index_meas - 2])
-                qcircuit.reset(qreg[index_meas])
-                index_meas -= 1
-
-            # Apply the X and Z corrections
-            index = self.num_qubits - 1
-            while index > 2:
-                with qcircuit.if_test((creg[index - 3], 1)):
-                    qcircuit.x(qreg[1])
-
-                with qcircuit.if_test((creg[index - 2], 1)):
-                    qcircuit.z(qreg[1])
-
-                index -= 2
-
-            qcircuit.swap(qreg[1], qreg[0])
+            qcircuit.compose(self.bob_to_alice_swap_block(), qubits = qreg, clbits = creg, inplace = True)
 
         qcircuit.measure(qreg[0], final_meas_creg)
 
-        counts, output = self.execute_protocol(qcircuit)
+        return qcircuit
+
+    def protocol2_entanglement(self) -> tuple[dict, int]:
+        """
+        Method for the execution of the second protocol for computing the logical operation AND. The communication between Alice and
+        Bob is done using entanglement swapping.
+
+        Returns:
+            tuple[dict, int]: The counts and the output of the most frequent result. It is 1 if Bob and Alice's inputs 
+            are 1 and 0 otherwise.
+        """
+
+        counts, output = self.execute_protocol(self.build_protocol("entanglement"), self.parameter_values())
 
         return counts, output
     
+    def circuit_key(self, name: str) -> tuple:
+        """
+        This method returns the key of the circuit of the protocol for cached_circuit. It holds the options that define
+        the structure of the circuit.
+
+        Args:
+            name (str): The name of the circuit of the protocol, it is either "cnot" or "entanglement".
+
+        Returns:
+            tuple: The key of the circuit.
+        """
+
+        key = (name, self.num_qubits, self.r, self.Bob_input == 1)
+
+        # The circuits of Fake Fez and of the backend also depend on the input of Alice, see alice_operation
+        if not (self.simulator and not self.noise):
+            key += (self.Alice_input == 1,)
+
+        return key
+
+    def build_protocol(self, type_communication: str | None = None) -> QuantumCircuit:
+        """
+        This method builds the circuit of the protocol depending on the type of communication. The circuit is only
+        built once and then reused for the following executions and, on the simulator without noise, for all the inputs of Alice.
+
+        Args:
+            type_communication (str, optional): The communication between Alice and Bob, it is either "cnot" or
+            "entanglement". Defaults to the chosen type of communication.
+
+        Returns:
+            QuantumCircuit: The circuit of the protocol.
+        """
+
+        type_communication = type_communication or self.type_communication
+
+        if type_communication == "cnot":
+            return self.cached_circuit(self.circuit_key("cnot"), self.circuit_protocol2_cnot)
+
+        return self.cached_circuit(self.circuit_key("entanglement"), self.circuit_protocol2_entanglement)
+
     def execute_second_protocol(self) -> int:
         """
         This method execute the protocol depending on the chosen type of communication and returns the output.
@@ -220,11 +247,7 @@ class AND_protocol_2(Run_protocol):
             int: The output of the AND is 0 or 1.
         """
 
-        if self.type_communication == "cnot":
-            self.counts, self.output = self.protocol2_cnot()
-        
-        else:
-            self.counts, self.output = self.protocol2_entanglement()
+        self.counts, self.output = self.execute_protocol(self.build_protocol(), self.parameter_values())
 
         print(f"The output for AND({self.Alice_input}, {self.Bob_input}) : {self.output}")
 
@@ -233,20 +256,48 @@ class AND_protocol_2(Run_protocol):
     def majority_vote(self) -> None:
         """
         This method displays the output of the logical AND according to a majority vote. The protocol is repeated 3 times and
-        the most frequent output is chosen.
+        the most frequent output is chosen. The 3 repetitions are executed in a single job.
         """
 
+        results = self.execute_protocol_repeated(self.build_protocol(), self.parameter_values(), repetitions = 3)
+
         outputs = []
-        for _ in range(3):
-            output = self.execute_second_protocol()
+        for _, output in results:
+            print(f"The output for AND({self.Alice_input}, {self.Bob_input}) : {output}")
             outputs.append(output)
 
-        final_output = max(set(outputs), key=outputs.count)
+        self.counts, self.output = results[-1]
+
+        # The outputs are bits, so the majority is 1 when more than half of them are 1
+        final_output = "1" if 2 * sum(int(output) for output in outputs) > len(outputs) else "0"
 
         print(f"The most frequent output for AND({self.Alice_input}, {self.Bob_input}) : {final_output}")
 
         return None
     
+    @staticmethod
+    def cost_protocol2_vec(r: np.ndarray) -> np.ndarray:
+        """
+        This method returns the communication cost of this protocol for each number of iterations r, as described in the
+        following paper https://arxiv.org/pdf/1801.02771
+
+        Args:
+            r (np.ndarray): The numbers of iterations r.
+
+        Returns:
+            np.ndarray: The communication cost for each r.
+        """
+
+        r = np.asarray(r, dtype = np.float64)
+        theta = np.pi/r
+
+        p = 0.5 * (1 - (np.cos(theta/2) ** r))
+
+        term1 = -p * np.log2(p)
+        term2 = (1 - p) * np.log2(1 - p)
+
+        return term1 - term2
+
     def communication_cost_protocol2(self) -> float:
         """
         This method returns the communication cost of this protocol as described in the following paper
@@ -256,10 +307,4 @@ class AND_protocol_2(Run_protocol):
             float: The communication cost
         """
 
-        p = 0.5 * (1 - (math.cos(self.theta/2) ** self.r))
-
-        term1 = -p * math.log(p, 2)
-        term2 = (1 - p) * math.log(1 - p, 2)
-        cost = term1 - term2
-
-        return cost
\ No newline at end of file
+        return float(self.cost_protocol2_vec(self.r))
\ No newline at end of file
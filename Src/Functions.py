@@ -1,13 +1,73 @@
-from qiskit import QuantumCircuit, QuantumRegister
+import itertools
+import logging
+import numpy as np
+
+from abc import ABC, abstractmethod
+from collections import Counter
+from functools import cached_property
+from qiskit import QuantumCircuit, QuantumRegister, ClassicalRegister
+from qiskit.circuit import Parameter
+from qiskit.circuit.library import UnitaryGate
+from qiskit.quantum_info import Operator
+from qiskit.transpiler import PassManager
 from qiskit.transpiler.preset_passmanagers import generate_preset_pass_manager
 from qiskit_ibm_runtime import QiskitRuntimeService
 from qiskit_ibm_runtime import SamplerV2 as Sampler
 from qiskit_ibm_runtime.fake_provider import FakeFez
 from qiskit_aer import AerSimulator
-from qiskit.compiler import transpile
 
+logger = logging.getLogger(__name__)
+
+# Instructions of the protocols that the Aer simulator executes without transpilation
+AER_NATIVE_OPS = {"id", "rx", "ry", "rz", "x", "z", "h", "cx", "cz", "swap", "unitary", "barrier", "measure", "reset", "if_else"}
+
+# Number of shots for one execution of a protocol
+SHOTS = 1000
+
+# Number of qubits from which the static circuits are optimized before running on the Aer simulator
+OPTIMIZATION_QUBIT_THRESHOLD = 8
+
+# Gates of the entanglement swapping fused into a single two-qubit unitary, the first qubit is the one with the Hadamard
+_epr_circuit = QuantumCircuit(2)
+_epr_circuit.h(0)
+_epr_circuit.cx(0, 1)
+EPR_GATE = UnitaryGate(Operator(_epr_circuit), label = "EPR")
+
+_bell_basis_circuit = QuantumCircuit(2)
+_bell_basis_circuit.cx(0, 1)
+_bell_basis_circuit.h(0)
+BELL_BASIS_GATE = UnitaryGate(Operator(_bell_basis_circuit), label = "Bell basis")
+
+# Fake Fez shared by all the noisy simulations, see _get_fake_fez
+_FAKE_FEZ = None
+
+
+def _get_fake_fez() -> FakeFez:
+    """
+    This function returns the fake backend Fake Fez. It is only created once since its construction loads the calibration
+    data of the backend.
+
+    Returns:
+        FakeFez: The fake backend.
+    """
+
+    global _FAKE_FEZ
+
+    if _FAKE_FEZ is None:
+        _FAKE_FEZ = FakeFez()
+
+    return _FAKE_FEZ
+
+
+class Func_run_protocol(ABC):
+    # parameters for the inputs of Alice and Bob in the circuits of the protocols
+    alice_param = Parameter("a")
+    bob_param = Parameter("b")
+
+    # circuits and transpiled circuits shared by all the instances, see cached_circuit and transpile_circuit
+    _circuits = {}
+    _transpiled_cache = {}
 
-class Func_run_protocol:
     def __init__(
             self, 
             simulator: bool = True, 
@@ -34,109 +94,693 @@ class Func_run_protocol:
         self.backend = backend
         self.qubit_Alice = qubit_Alice
         self.qubit_Bob = qubit_Bob
+        self.num_qubits = (self.qubit_Bob - self.qubit_Alice) + 1
+
+    def cached_circuit(self, key: tuple, build_circuit) -> QuantumCircuit:
+        """
+        This method returns the circuit identified by the key and builds it only the first time. Since the inputs of Alice
+        and Bob are parameters of the circuit, the same circuit is shared by all the instances with the same key.
+
+        Args:
+            key (tuple): The options that define the structure of the circuit. The class, the simulator and the noise
+            options are added to it since the circuit can depend on where it runs.
+            build_circuit (Callable[[], QuantumCircuit]): The method that builds the circuit.
+
+        Returns:
+            QuantumCircuit: The circuit of the protocol with the parameters of Alice and Bob.
+        """
+
+        key = (type(self).__name__, self.simulator, self.noise, *key)
+
+        if key not in self._circuits:
+            self._circuits[key] = build_circuit()
+
+        return self._circuits[key]
+
+    @abstractmethod
+    def build_protocol(self, type_communication: str | None = None) -> QuantumCircuit:
+        """
+        This method builds the circuit of the protocol depending on the type of communication. It is defined by each
+        protocol.
+
+        Args:
+            type_communication (str, optional): The communication between Alice and Bob, it is either "cnot" or
+            "entanglement". Defaults to the chosen type of communication.
+
+        Returns:
+            QuantumCircuit: The circuit of the protocol.
+        """
+
+    @abstractmethod
+    def parameter_values(self) -> dict:
+        """
+        This method returns the values of the parameters of the circuit depending on the inputs. It is defined by each
+        protocol.
+
+        Returns:
+            dict: The value of each parameter of the circuit.
+        """
+
+    @classmethod
+    def run_truth_table(cls, type_communication: str, **kwargs) -> dict[tuple[int, int], str]:
+        """
+        This method executes the protocol for the 4 inputs of Alice and Bob in a single job. On the simulator without noise,
+        the circuits are built once and each input is given by the values of the parameters of the circuits.
+
+        Args:
+            type_communication (str): The communication between Alice and Bob, it is either "cnot" or "entanglement".
+            **kwargs: The other options of the protocol, like simulator, noise, qubit_Alice, qubit_Bob, backend and r.
+
+        Returns:
+            dict[tuple[int, int], str]: The output of the AND for each input (Alice_input, Bob_input).
+        """
+
+        protocols = [cls(Alice_input, Bob_input, type_communication, **kwargs) for Alice_input, Bob_input in itertools.product((0, 1), repeat = 2)]
+        pubs = [(protocol.build_protocol(), protocol.parameter_values()) for protocol in protocols]
+
+        # All the protocols have the same options, so any of them can run the job
+        runner = protocols[0]
+        all_counts = runner.run_circuits(pubs)
+
+        outputs = {}
+        for protocol, counts in zip(protocols, all_counts):
+            protocol.counts, protocol.output = protocol.output_counts(counts)
+            print(f"The output for AND({protocol.Alice_input}, {protocol.Bob_input}) : {protocol.output}")
+            outputs[(protocol.Alice_input, protocol.Bob_input)] = protocol.output
+
+        return outputs
+
+    def transpile_circuit(self, circuit: QuantumCircuit, get_pass_manager) -> QuantumCircuit:
+        """
+        This method transpiles the circuit with the pass manager of the backend. The transpiled circuit is cached so that a
+        circuit executed multiple times, like in the majority vote or for the different inputs, is only transpiled once.
+        The pass manager is only requested when the circuit is not in the cache, so it is not built on a cache hit.
+
+        Args:
+            circuit (QuantumCircuit): The circuit to transpile.
+            get_pass_manager (Callable[[], PassManager]): The function that returns the pass manager for the backend on
+            which the circuit will be executed.
+
+        Returns:
+            QuantumCircuit: The transpiled circuit.
+        """
+
+        key = (id(circuit), self.backend, self.simulator, self.noise, self.qubit_Alice)
+
+        if key not in self._transpiled_cache:
+            transpiled_circuit = get_pass_manager().run(circuit)
+            # The circuit is kept with its transpiled version so that its id can not be reused by another circuit
+            self._transpiled_cache[key] = (circuit, transpiled_circuit)
+
+        return self._transpiled_cache[key][1]
+
+    @cached_property
+    def _aer_simulator(self) -> AerSimulator:
+        """
+        The Aer simulator for the simulation without noise. The gate fusion is enabled from 8 qubits, instead of the
+        default 14, since the entanglement protocols reach this size as the distance between Alice and Bob grows.
+
+        Returns:
+            AerSimulator: The simulator.
+        """
+
+        return AerSimulator(method = "statevector", fusion_enable = True, fusion_threshold = 8, fusion_max_qubit = 4)
+
+    @cached_property
+    def _aer_pm(self) -> PassManager:
+        """
+        The pass manager to transpile the circuits with instructions unknown to the Aer simulator.
+
+        Returns:
+            PassManager: The pass manager of the simulator.
+        """
+
+        return generate_preset_pass_manager(optimization_level = 0, backend = self._aer_simulator)
 
-    def execute_simulator(self, circuit: QuantumCircuit) -> dict:
+    @cached_property
+    def _aer_pm_optimized(self) -> PassManager:
+        """
+        The pass manager to optimize the large static circuits for the Aer simulator.
+
+        Returns:
+            PassManager: The pass manager of the simulator.
+        """
+
+        return generate_preset_pass_manager(optimization_level = 2, backend = self._aer_simulator)
+
+    @cached_property
+    def _fake_fez(self) -> FakeFez:
+        """
+        The fake backend Fake Fez used for the noisy simulation, shared by all the instances.
+
+        Returns:
+            FakeFez: The fake backend.
+        """
+
+        return _get_fake_fez()
+
+    @cached_property
+    def _noise_sampler(self) -> Sampler:
+        """
+        The sampler for the noisy simulation on Fake Fez.
+
+        Returns:
+            Sampler: The sampler of the fake backend.
+        """
+
+        return Sampler(mode = self._fake_fez)
+
+    @cached_property
+    def _noise_pm(self) -> PassManager:
+        """
+        The pass manager to transpile the circuits for Fake Fez.
+
+        Returns:
+            PassManager: The pass manager of the fake backend.
+        """
+
+        return generate_preset_pass_manager(optimization_level = 0, backend = self._fake_fez)
+
+    @cached_property
+    def _runtime_service(self) -> QiskitRuntimeService:
+        """
+        The service to access IBM's backends. It is created once per instance to avoid the authentication at each job.
+
+        Returns:
+            QiskitRuntimeService: The runtime service.
+        """
+
+        # Add your token and your instance
+        return QiskitRuntimeService(channel="ibm_cloud")
+
+    @cached_property
+    def _runtime_backend(self):
+        """
+        The chosen IBM backend.
+
+        Returns:
+            IBMBackend: The backend on which to run the protocol.
+        """
+
+        return self._runtime_service.backend(name = self.backend)
+
+    @cached_property
+    def _runtime_pm(self) -> PassManager:
+        """
+        The pass manager to transpile the circuits for the chosen IBM backend on the qubits between Alice and Bob.
+
+        Returns:
+            PassManager: The pass manager of the backend.
+        """
+
+        return generate_preset_pass_manager(optimization_level = 0, backend = self._runtime_backend, initial_layout = [qubit for qubit in range(self.qubit_Alice, self.qubit_Bob + 1)])
+
+    def transpile_simulator_circuit(self, circuit: QuantumCircuit) -> QuantumCircuit:
+        """
+        This method prepares the circuit for the Aer simulator. The simulator has no topology, so the circuit is only
+        transpiled if it has instructions unknown to Aer or if it is large enough for the merge and cancel passes to pay off.
+
+        Args:
+            circuit (QuantumCircuit): The circuit to run on the simulator.
+
+        Returns:
+            QuantumCircuit: The circuit to run on the simulator.
+        """
+
+        ops = set(circuit.count_ops())
+
+        if circuit.num_qubits >= OPTIMIZATION_QUBIT_THRESHOLD and "if_else" not in ops:
+            return self.transpile_circuit(circuit, lambda: self._aer_pm_optimized)
+
+        elif ops <= AER_NATIVE_OPS:
+            return circuit
+
+        return self.transpile_circuit(circuit, lambda: self._aer_pm)
+
+    def execute_simulator(self, circuit: QuantumCircuit, parameter_values: dict | None = None, shots: int = SHOTS, memory: bool = False) -> dict | list[str]:
         """
         This method execute the circuit on the Aer simulator and returns the result.
 
         Args:
             circuit (QuantumCircuit): The circuit to run on the simulator.
+            parameter_values (dict | None, optional): The values of the parameters of the circuit. Defaults to None.
+            shots (int, optional): The number of shots. Defaults to SHOTS.
+            memory (bool, optional): Option to return the bit string of each shot instead of the counts. Defaults to False.
 
         Returns:
-            dict: The counts of the measurement of Alice's qubit.
+            dict | list[str]: The counts of the measurement of Alice's qubit or the bit string of each shot.
         """
         
-        simulator = AerSimulator()
-        transpiled_circuit = transpile(circuit, backend = simulator, optimization_level=0, initial_layout = [qubit for qubit in range(self.qubit_Alice, self.qubit_Bob + 1)])
-        print(transpiled_circuit)
-        result = simulator.run(transpiled_circuit, shots = 1000).result()
+        simulator = self._aer_simulator
+        transpiled_circuit = self.transpile_simulator_circuit(circuit)
+
+        if parameter_values:
+            transpiled_circuit = transpiled_circuit.assign_parameters(parameter_values)
+        result = simulator.run(transpiled_circuit, shots = shots, memory = memory).result()
+
+        if memory:
+            return result.get_memory(transpiled_circuit)
+
         counts = result.get_counts(transpiled_circuit)
         
         return counts
     
-    def execute_simulator_noise(self, circuit: QuantumCircuit) -> str:
+    def execute_simulator_noise(self, circuit: QuantumCircuit, parameter_values: dict | None = None, shots: int = SHOTS, memory: bool = False) -> dict | list[str]:
         """
         This method execute the circuit on a noisy simulator, Fake Fez, and returns the result.
 
         Args:
             circuit (QuantumCircuit): The circuit to run on the noisy simulator.
+            parameter_values (dict | None, optional): The values of the parameters of the circuit. Defaults to None.
+            shots (int, optional): The number of shots. Defaults to SHOTS.
+            memory (bool, optional): Option to return the bit string of each shot instead of the counts. Defaults to False.
 
         Returns:
-            str: Bit string of the most frequent result.
+            dict | list[str]: The counts of the measurement or the bit string of each shot.
         """
        
-        backend = FakeFez()
-        transpiled_circuit = transpile(circuit, backend = backend, optimization_level = 0)
-        print(transpiled_circuit)
+        transpiled_circuit = self.transpile_circuit(circuit, lambda: self._noise_pm)
+        if parameter_values:
+            transpiled_circuit = transpiled_circuit.assign_parameters(parameter_values)
+        logger.debug("Transpiled circuit:\n%s", transpiled_circuit)
 
-        sampler = Sampler(mode = backend)
-        
-        job = sampler.run([transpiled_circuit], shots = 1000)
+        job = self._noise_sampler.run([transpiled_circuit], shots = shots)
         pub_result = job.result()[0]
+
+        if memory:
+            return pub_result.join_data().get_bitstrings()
+
         counts = pub_result.join_data().get_counts()
 
         return counts
     
-    def execute_backend(self, circuit: QuantumCircuit):
+    def execute_backend(self, circuit: QuantumCircuit, parameter_values: dict | None = None, shots: int = SHOTS, memory: bool = False):
         """
         This method execute the circuit on IBM's backend and returns the result.
 
         Args:
             circuit (QuantumCircuit): The circuit to execute on the backend.
+            parameter_values (dict | None, optional): The values of the parameters of the circuit. Defaults to None.
+            shots (int, optional): The number of shots. Defaults to SHOTS.
+            memory (bool, optional): Option to return the bit string of each shot instead of the counts. Defaults to False.
+
+        Returns:
+            dict | list[str]: The counts of the measurement or the bit string of each shot.
         """
 
-        # Add your token and your instance
-        service = QiskitRuntimeService(channel="ibm_cloud")
-        backend = service.backend(name = self.backend)
+        backend = self._runtime_backend
         print(f">>> Backend: {backend}")
-        pm = generate_preset_pass_manager(optimization_level = 0, backend = backend, initial_layout=[qubit for qubit in range(self.qubit_Alice, self.qubit_Bob + 1)])
-        isa_circuit = pm.run(circuit)
-        print(isa_circuit)
+        isa_circuit = self.transpile_circuit(circuit, lambda: self._runtime_pm)
+        if parameter_values:
+            isa_circuit = isa_circuit.assign_parameters(parameter_values)
+        logger.debug("ISA circuit:\n%s", isa_circuit)
 
         sampler = Sampler(mode = backend)
-        sampler.options.default_shots = 1000
-        job = sampler.run([isa_circuit])
+        job = sampler.run([isa_circuit], shots = shots)
 
         print(f">>> Job ID: {job.job_id()}")
         print(f">>> Job Status: {job.status()}")
         
         result = job.result()
         pub_result = result[0]
+
+        if memory:
+            return pub_result.join_data().get_bitstrings()
+
         counts = pub_result.join_data().get_counts()
 
         return counts
     
-    def execute_protocol(self, circuit: QuantumCircuit) -> tuple[dict, int]:
+    def run_circuit(self, circuit: QuantumCircuit, parameter_values: dict | None = None, shots: int = SHOTS, memory: bool = False) -> dict | list[str]:
         """
-        Execute the protocol either on simulator, with or without noise, or the specified QPU.
+        Run the circuit either on simulator, with or without noise, or the specified QPU.
 
         Args:
             circuit (QuantumCircuit): The circuit to execute.
+            parameter_values (dict | None, optional): The values of the parameters of the circuit. Defaults to None.
+            shots (int, optional): The number of shots. Defaults to SHOTS.
+            memory (bool, optional): Option to return the bit string of each shot instead of the counts. Defaults to False.
 
         Returns:
-            tuple[dict, int]: The counts and the bit string of the most frequent result. It is 1 if Bob and Alice inputs 
-            are 1 and 0 otherwise.
+            dict | list[str]: The counts of the measurement or the bit string of each shot.
         """
 
         if self.simulator and self.noise:
-            counts = self.execute_simulator_noise(circuit)
+            return self.execute_simulator_noise(circuit, parameter_values, shots, memory)
 
         elif self.simulator and not self.noise:
-            counts = self.execute_simulator(circuit)
+            return self.execute_simulator(circuit, parameter_values, shots, memory)
 
+        return self.execute_backend(circuit, parameter_values, shots, memory)
+
+    def run_circuits(self, pubs: list[tuple[QuantumCircuit, dict]], shots: int = SHOTS) -> list[dict]:
+        """
+        Run multiple circuits, each with the values of its parameters, in a single job either on simulator, with or without
+        noise, or the specified QPU. Each circuit is transpiled once and the values of the parameters are given with it.
+
+        Args:
+            pubs (list[tuple[QuantumCircuit, dict]]): The circuits with the values of their parameters.
+            shots (int, optional): The number of shots for each circuit. Defaults to SHOTS.
+
+        Returns:
+            list[dict]: The counts of the measurement for each circuit.
+        """
+
+        if self.simulator and not self.noise:
+            circuits = [self.transpile_simulator_circuit(circuit).assign_parameters(values) for circuit, values in pubs]
+            result = self._aer_simulator.run(circuits, shots = shots).result()
+
+            return [result.get_counts(i) for i in range(len(circuits))]
+
+        if self.simulator:
+            sampler = self._noise_sampler
+            get_pass_manager = lambda: self._noise_pm
         else:
-            counts = self.execute_backend(circuit)
+            sampler = Sampler(mode = self._runtime_backend)
+            get_pass_manager = lambda: self._runtime_pm
 
-        final_counts = {"0": 0, "1": 0}
-        for key, value in counts.items():
-            final_counts[key[0]] += value
+        sampler_pubs = []
+        for circuit, values in pubs:
+            isa_circuit = self.transpile_circuit(circuit, get_pass_manager)
+            sampler_pubs.append((isa_circuit, [values[parameter] for parameter in isa_circuit.parameters]))
 
-        output = max(final_counts, key = final_counts.get)
+        job = sampler.run(sampler_pubs, shots = shots)
+
+        if not self.simulator:
+            print(f">>> Job ID: {job.job_id()}")
+
+        return [pub_result.join_data().get_counts() for pub_result in job.result()]
+
+    @staticmethod
+    def output_counts(counts: dict) -> tuple[dict, str]:
+        """
+        This method computes the counts of the output register, the measurement of Alice's qubit, and the output.
+
+        Args:
+            counts (dict): The counts of the bit strings of the measurement.
+
+        Returns:
+            tuple[dict, str]: The counts and the bit string of the most frequent result.
+        """
+
+        # The first bit of each bit string is the measurement of Alice's qubit
+        output_bits = np.fromiter((key[0] == "1" for key in counts), dtype = np.bool_, count = len(counts))
+        values = np.fromiter(counts.values(), dtype = np.int64, count = len(counts))
+
+        ones = int(values[output_bits].sum())
+        zeros = int(values.sum()) - ones
+
+        final_counts = {"0": zeros, "1": ones}
+        output = "1" if ones > zeros else "0"
 
-        print(f"Counts for the output register: {final_counts}")
-        
         return final_counts, output
+
+    def execute_protocol(self, circuit: QuantumCircuit, parameter_values: dict | None = None) -> tuple[dict, int]:
+        """
+        Execute the protocol either on simulator, with or without noise, or the specified QPU.
+
+        Args:
+            circuit (QuantumCircuit): The circuit to execute.
+            parameter_values (dict | None, optional): The values of the parameters of the circuit. Defaults to None.
+
+        Returns:
+            tuple[dict, int]: The counts and the bit string of the most frequent result. It is 1 if Bob and Alice inputs 
+            are 1 and 0 otherwise.
+        """
+
+        counts = self.run_circuit(circuit, parameter_values)
+
+        return self.output_counts(counts)
+
+    def execute_protocol_repeated(self, circuit: QuantumCircuit, parameter_values: dict | None = None, repetitions: int = 3) -> list[tuple[dict, int]]:
+        """
+        Execute the protocol multiple times in a single job. The job has SHOTS shots for each repetition and the shots are
+        split in consecutive windows of SHOTS shots, one for each repetition.
+
+        Args:
+            circuit (QuantumCircuit): The circuit to execute.
+            parameter_values (dict | None, optional): The values of the parameters of the circuit. Defaults to None.
+            repetitions (int, optional): The number of repetitions of the protocol. Defaults to 3.
+
+        Returns:
+            list[tuple[dict, int]]: The counts and the bit string of the most frequent result for each repetition.
+        """
+
+        bitstrings = self.run_circuit(circuit, parameter_values, shots = repetitions * SHOTS, memory = True)
+
+        results = []
+        for i in range(repetitions):
+            counts = Counter(bitstrings[i * SHOTS:(i + 1) * SHOTS])
+            results.append(self.output_counts(counts))
+
+        return results
     
+    def apply_barrier(self, qcircuit: QuantumCircuit) -> None:
+        """
+        This method appends a barrier between the steps of the protocol when it runs on the backend. On the simulators the
+        barrier is not added since it prevents the transpiler from merging the gates and Aer from fusing them.
+
+        Args:
+            qcircuit (QuantumCircuit): The circuit of the protocol.
+        """
+
+        if not self.simulator:
+            qcircuit.barrier()
+
+    def apply_correction(self, qcircuit: QuantumCircuit, pauli: str, qubit_meas, clbit, target) -> None:
+        """
+        This method appends a Pauli correction of the entanglement swapping, applied on the target when the measurement of
+        qubit_meas, stored in clbit, is 1. It has to be called after the measurement of qubit_meas and, on the simulator
+        without noise, before its reset.
+
+        On the simulator without noise, the correction is controlled by the measured qubit instead of the classical bit.
+        The qubit is in the state given by its measurement, so both are equivalent, but the circuit has no if_test
+        and Aer does not take the path of dynamic circuits. The classical correction is kept on Fake Fez and on the
+        backend, where the qubits are not neighbours and a controlled gate would need a routing.
+
+        Args:
+            qcircuit (QuantumCircuit): The circuit of the protocol.
+            pauli (str): The correction to apply, it is either "x" or "z".
+            qubit_meas (Qubit): The measured qubit.
+            clbit (Clbit): The classical bit with the measurement of qubit_meas.
+            target (Qubit): The qubit to correct.
+        """
+
+        if self.simulator and not self.noise:
+            if pauli == "x":
+                qcircuit.cx(qubit_meas, target)
+            else:
+                qcircuit.cz(qubit_meas, target)
+
+        else:
+            with qcircuit.if_test((clbit, 1)):
+                if pauli == "x":
+                    qcircuit.x(target)
+                else:
+                    qcircuit.z(target)
+
+    def apply_epr_pair(self, qcircuit: QuantumCircuit, qubit_h, qubit_target) -> None:
+        """
+        This method appends the creation of an EPR pair, a Hadamard gate on qubit_h followed by a CNOT gate on qubit_target.
+        On the simulator without noise, both gates are appended as a single unitary so that Aer applies them at once. On
+        Fake Fez and on the backend, the native gates are kept.
+
+        Args:
+            qcircuit (QuantumCircuit): The circuit of the protocol.
+            qubit_h (Qubit): The qubit with the Hadamard gate, it is the control of the CNOT gate.
+            qubit_target (Qubit): The target of the CNOT gate.
+        """
+
+        if self.simulator and not self.noise:
+            qcircuit.append(EPR_GATE, [qubit_h, qubit_target])
+
+        else:
+            qcircuit.h(qubit_h)
+            qcircuit.cx(qubit_h, qubit_target)
+
+    def apply_bell_basis(self, qcircuit: QuantumCircuit, qubit_h, qubit_target) -> None:
+        """
+        This method appends the change to the Bell basis before the Bell measure, a CNOT gate on qubit_target followed by a
+        Hadamard gate on qubit_h. On the simulator without noise, both gates are appended as a single unitary.
+
+        Args:
+            qcircuit (QuantumCircuit): The circuit of the protocol.
+            qubit_h (Qubit): The qubit with the Hadamard gate, it is the control of the CNOT gate.
+            qubit_target (Qubit): The target of the CNOT gate.
+        """
+
+        if self.simulator and not self.noise:
+            qcircuit.append(BELL_BASIS_GATE, [qubit_h, qubit_target])
+
+        else:
+            qcircuit.cx(qubit_h, qubit_target)
+            qcircuit.h(qubit_h)
+
+    def apply_communication_CNOT(self, qcircuit: QuantumCircuit, qreg: QuantumRegister, inverse: bool = False) -> None:
+        """
+        This method appends the communication between Alice and Bob using Control-Not gates directly to the circuit. It
+        emits the same gates as communication_CNOT, or its inverse, without going through QuantumCircuit.compose.
+
+        Args:
+            qcircuit (QuantumCircuit): The circuit of the protocol.
+            qreg (QuantumRegister): The qubits between Alice and Bob.
+            inverse (bool, optional): Option for the communication from Bob to Alice. Defaults to False.
+        """
+
+        num_qubits = len(qreg)
+
+        if not inverse:
+            for i in range(num_qubits - 1):
+                qcircuit.cx(qreg[i], qreg[i + 1])
+
+            for i in range(num_qubits - 1):
+                qcircuit.cx(qreg[i + 1], qreg[i])
+
+        else:
+            for i in reversed(range(num_qubits - 1)):
+                qcircuit.cx(qreg[i + 1], qreg[i])
+
+            for i in reversed(range(num_qubits - 1)):
+                qcircuit.cx(qreg[i], qreg[i + 1])
+
+    def _check_entanglement_qubits(self) -> None:
+        """
+        This method checks that the qubits between Alice and Bob can be split into EPR pairs for the entanglement swapping.
+        The number of qubits needs to be even and there needs to be at least one EPR pair between Alice and Bob.
+
+        Raises:
+            ValueError: If the number of qubits between Alice and Bob is odd or smaller than 4.
+        """
+
+        if self.num_qubits % 2 == 1 or self.num_qubits < 4:
+            raise ValueError(f"The entanglement swapping needs an even number of qubits, at least 4, between Alice and Bob, but there are {self.num_qubits}.")
+
+    def alice_to_bob_swap_block(self) -> QuantumCircuit:
+        """
+        This method returns the circuit for the communication from Alice to Bob using entanglement swapping. The circuit
+        only depends on the number of qubits, so it is built once and composed at every iteration of the protocol.
+
+        Returns:
+            QuantumCircuit: The circuit on the qubits between Alice and Bob and the classical register of the measurements.
+        """
+
+        return self.cached_circuit(("alice_to_bob", self.num_qubits), self._build_alice_to_bob_swap_block)
+
+    def _build_alice_to_bob_swap_block(self) -> QuantumCircuit:
+        """
+        This method builds the circuit for the communication from Alice to Bob using entanglement swapping.
+
+        Returns:
+            QuantumCircuit: The circuit on the qubits between Alice and Bob and the classical register of the measurements.
+        """
+
+        self._check_entanglement_qubits()
+
+        num_qubits = self.num_qubits
+        qreg = QuantumRegister(num_qubits)
+        creg = ClassicalRegister(num_qubits - 2)
+        qcircuit = QuantumCircuit(qreg, creg)
+
+        # Indices of the first qubit of each EPR pair and of each pair measured in the Bell basis
+        num_pairs = (num_qubits - 2) // 2
+        epr_pair_indices = [1 + 2 * k for k in range(num_pairs)]
+        basis_pair_indices = [2 * k for k in range(num_pairs)]
+
+        # Create the EPR pairs on the qubits between Alice and Bob
+        for i in epr_pair_indices:
+            self.apply_epr_pair(qcircuit, qreg[i], qreg[i + 1])
+
+        # Change the basis for the Bell measure
+        for i in basis_pair_indices:
+            self.apply_bell_basis(qcircuit, qreg[i], qreg[i + 1])
+
+        # The corrections of the simulator without noise are controlled by the measured qubits, so the qubits are reset
+        # after the corrections. Otherwise, each qubit is reset right after its measurement.
+        reset_after_corrections = self.simulator and not self.noise
+
+        # Measure and reset the qubits
+        for i in range(num_qubits - 2):
+            qcircuit.measure(qreg[i], creg[i])
+            if not reset_after_corrections:
+                qcircuit.reset(qreg[i])
+
+        # Apply the X and Z corrections
+        for i in basis_pair_indices:
+            self.apply_correction(qcircuit, "x", qreg[i + 1], creg[i + 1], qreg[num_qubits - 2])
+            self.apply_correction(qcircuit, "z", qreg[i], creg[i], qreg[num_qubits - 2])
+
+        # Reset the qubits
+        if reset_after_corrections:
+            for i in range(num_qubits - 2):
+                qcircuit.reset(qreg[i])
+
+        qcircuit.swap(qreg[num_qubits - 2], qreg[num_qubits - 1])
+
+        return qcircuit
+
+    def bob_to_alice_swap_block(self) -> QuantumCircuit:
+        """
+        This method returns the circuit for the communication from Bob to Alice using entanglement swapping. The circuit
+        only depends on the number of qubits, so it is built once and composed at every iteration of the protocol.
+
+        Returns:
+            QuantumCircuit: The circuit on the qubits between Alice and Bob and the classical register of the measurements.
+        """
+
+        return self.cached_circuit(("bob_to_alice", self.num_qubits), self._build_bob_to_alice_swap_block)
+
+    def _build_bob_to_alice_swap_block(self) -> QuantumCircuit:
+        """
+        This method builds the circuit for the communication from Bob to Alice using entanglement swapping.
+
+        Returns:
+            QuantumCircuit: The circuit on the qubits between Alice and Bob and the classical register of the measurements.
+        """
+
+        self._check_entanglement_qubits()
+
+        num_qubits = self.num_qubits
+        qreg = QuantumRegister(num_qubits)
+        creg = ClassicalRegister(num_qubits - 2)
+        qcircuit = QuantumCircuit(qreg, creg)
+
+        # Indices of the first qubit of each EPR pair and of each pair measured in the Bell basis
+        num_pairs = (num_qubits - 2) // 2
+        epr_pair_indices = [num_qubits - 2 - 2 * k for k in range(num_pairs)]
+        basis_pair_indices = [num_qubits - 1 - 2 * k for k in range(num_pairs)]
+
+        # Create the EPR pairs on the qubits between Alice and Bob
+        for i in epr_pair_indices:
+            self.apply_epr_pair(qcircuit, qreg[i], qreg[i - 1])
+
+        # Change the basis for the Bell measure
+        for i in basis_pair_indices:
+            self.apply_bell_basis(qcircuit, qreg[i], qreg[i - 1])
+
+        # The corrections of the simulator without noise are controlled by the measured qubits, so the qubits are reset
+        # after the corrections. Otherwise, each qubit is reset right after its measurement.
+        reset_after_corrections = self.simulator and not self.noise
+
+        # Measure and reset the qubits
+        for i in range(num_qubits - 1, 1, -1):
+            qcircuit.measure(qreg[i], creg[i - 2])
+            if not reset_after_corrections:
+                qcircuit.reset(qreg[i])
+
+        # Apply the X and Z corrections
+        for i in basis_pair_indices:
+            self.apply_correction(qcircuit, "x", qreg[i - 1], creg[i - 3], qreg[1])
+            self.apply_correction(qcircuit, "z", qreg[i], creg[i - 2], qreg[1])
+
+        # Reset the qubits
+        if reset_after_corrections:
+            for i in range(num_qubits - 1, 1, -1):
+                qcircuit.reset(qreg[i])
+
+        qcircuit.swap(qreg[1], qreg[0])
+
+        return qcircuit
+
     def communication_CNOT(self) -> QuantumCircuit:
         """
         This method execute the communication between Alice and Bob using Control-Not gates.
@@ -145,7 +789,7 @@ class Func_run_protocol:
             QuantumCircuit: The circuit for the communication between the qubits.
         """
 
-        num_qubits = (self.qubit_Bob - self.qubit_Alice) + 1
+        num_qubits = self.num_qubits
         qreg = QuantumRegister(num_qubits)
         comm_qc = QuantumCircuit(qreg)
 